@@ -1,23 +1,50 @@
 import argparse
 import logging
 import os
+import pathlib
 import re
-import subprocess
+import shutil
 import sys
+from datetime import datetime
+from xml.sax.saxutils import escape as xml_escape
 
-from osgeo import gdal, gdalconst, ogr
+from osgeo import gdal, gdalconst
 from lib import taskhandler, VERSION, SHORT_VERSION, utils
 
+gdal.UseExceptions()
+VRTdrv = gdal.GetDriverByName("VRT")
+
 #### Create Logger
 logger = logging.getLogger("logger")
 logger.setLevel(logging.INFO)
 
-strip_pattern = re.compile(r"SETSM_(?P<pairname>(?P<sensor>[A-Z]{2}\d{2})_(?P<timestamp>\d{8})_(?P<catid1>[A-Z0-9]{16})_(?P<catid2>[A-Z0-9]{16}))_(?P<partnum>\d+)_(?P<res>\d+m)_matchtag.tif", re.I)
+translation_vector_pattern = re.compile(r"Translation Vector \(dz,dx,dy\)\(m\)=\s*(?P<dz>[-+\d.eE]+),\s*(?P<dx>[-+\d.eE]+),\s*(?P<dy>[-+\d.eE]+)")
 default_res = 16
 default_format = 'JPEG'
 suffixes = ('ortho', 'matchtag', 'dem')
+raster_suffixes = ('dem.tif', 'matchtag.tif', 'ortho.tif')
 formats = ('JPEG', 'GTiff')
 
+## VRT source that adds the registration z offset to every valid DEM pixel
+dem_offset_source = (
+    '<ComplexSource>'
+    '<SourceFilename relativeToVRT="0">{srcfp}</SourceFilename>'
+    '<SourceBand>1</SourceBand>'
+    '<ScaleOffset>{dz}</ScaleOffset>'
+    '<ScaleRatio>1</ScaleRatio>'
+    '<NODATA>{nodata}</NODATA>'
+    '</ComplexSource>'
+)
+
+## GDAL/PROJ settings applied unless already set in the environment.  Source rasters are opened without
+## scanning their (often very large) directories for sidecar files, and no .aux.xml files are written.
+gdal_config_options = {
+    'GDAL_DISABLE_READDIR_ON_OPEN': 'EMPTY_DIR',
+    'GDAL_PAM_ENABLED': 'NO',
+    'GDAL_CACHEMAX': '512',
+    'PROJ_NETWORK': 'OFF',
+}
+
 submission_script_map = {
     'pbs': 'pbs_resample.sh',
     'slurm': 'slurm_resample.sh'
@@ -28,18 +55,24 @@ def main():
     parser = argparse.ArgumentParser()
     
     #### Set Up Options
-    parser.add_argument("src", help="source directory or image")
+    parser.add_argument("src", help="source directory, text file of raster paths, or image")
     parser.add_argument("--dstdir", help="destination directory")
     parser.add_argument("-o", "--overwrite", action="store_true", default=False,
                         help="overwrite existing files if present")
+    parser.add_argument("--legacy-lzw", action="store_true", default=False,
+                        help="write LZW compressed output as in earlier versions instead of ZSTD")
+    parser.add_argument("--job-array", action="store_true", default=False,
+                        help="submit all tasks as a single scheduler job array (requires scheduler option; PBS job arrays use Torque qsub -t and are not supported on PBS Pro)")
+    parser.add_argument("--array-limit", type=int,
+                        help="maximum number of job array tasks to run at once")
     parser.add_argument("--dryrun", action="store_true", default=False,
                         help="print actions without executing")
     parser.add_argument('--version', action='version', version=f"Current version: {SHORT_VERSION}",
                         help='print version and exit')
 
     pos_arg_keys = ['src']
-    arg_keys_to_remove = utils.SCHEDULER_ARGS + ['dryrun']
-    utils.add_scheduler_options(parser, submission_script_map)
+    arg_keys_to_remove = utils.SCHEDULER_ARGS + ['dryrun', 'job_array', 'array_limit', 'task_dir']
+    utils.add_scheduler_options(parser, submission_script_map, include_tasks_per_job=True)
 
     #### Parse Arguments
     args = parser.parse_args()
@@ -52,6 +85,8 @@ def main():
         
     ## Verify qsubscript
     qsubpath = utils.verify_scheduler_args(parser, args, scriptpath, submission_script_map)
+    if args.job_array and not args.scheduler:
+        parser.error("--job-array requires the scheduler option")
     
     #### Set up console logging handler
     lso = logging.StreamHandler()
@@ -62,62 +97,95 @@ def main():
 
     logger.info("Current version: %s", VERSION)
 
+    for k, v in gdal_config_options.items():
+        if gdal.GetConfigOption(k) is None:
+            gdal.SetConfigOption(k, v)
+
     #### Get args ready to pass to task handler
     arg_str_base = taskhandler.convert_optional_args_to_string(args, pos_arg_keys, arg_keys_to_remove)
+
+    ## job batch and manifest text files are kept out of the source tree
+    task_dir = os.path.abspath(args.task_dir) if args.task_dir else os.getcwd()
+    if (args.job_array or args.tasks_per_job) and not args.dryrun:
+        pathlib.Path(task_dir).mkdir(parents=True, exist_ok=True)
         
+    ## source sizes are only needed to order tasks for parallel processing
+    weigh_tasks = args.parallel_processes > 1
+
     task_queue = []
     i=0
     logger.info("Searching for SETSM rasters")
     if os.path.isfile(src):
-        if src.endswith(('dem.tif','matchtag.tif','ortho.tif')):
-            srcfp = src
-            regfp = srcfp.replace('dem.tif','reg.txt').replace('matchtag.tif','reg.txt').replace('ortho.tif','reg.txt')
-            
-            if not os.path.isfile(regfp):
-                logger.info("No regfile found for {}".format(src))
-            else:
-                if args.dstdir:
-                    dstfp = "{}_reg.tif".format(os.path.join(args.dstdir, os.path.basename(os.path.splitext(srcfp)[0])))
-                else:
-                    dstfp = "{}_reg.tif".format(os.path.splitext(srcfp)[0])
-                if not os.path.isfile(dstfp):
-                    i+=1
-                    task = taskhandler.Task(
-                        os.path.basename(srcfp),
-                        'Reg{:04g}'.format(i),
-                        'python',
-                        '{} {} {}'.format(scriptpath, arg_str_base, srcfp),
-                        apply_reg,
-                        [srcfp, args]
-                    )
-                    task_queue.append(task)
-    
-    else:                
-        for root,dirs,files in os.walk(src):
-            for f in files:
-                if f.endswith(('dem.tif','matchtag.tif','ortho.tif')):
-                    srcfp = os.path.join(root,f)
-                    regfp = srcfp.replace('dem.tif','reg.txt').replace('matchtag.tif','reg.txt').replace('ortho.tif','reg.txt')
-                    if not os.path.isfile(regfp):
-                        logger.info("No regfile found for {}".format(srcfp))
-                    else:
-                        if args.dstdir:
-                            dstfp = "{}_reg.tif".format(os.path.join(args.dstdir, os.path.basename(os.path.splitext(srcfp)[0])))
-                        else:
-                            dstfp = "{}_reg.tif".format(os.path.splitext(srcfp)[0])
-                        if not os.path.isfile(dstfp):
-                            i+=1
-                            task = taskhandler.Task(
-                                f,
-                                'Reg{:04g}'.format(i),
-                                'python',
-                                '{} {} {}'.format(scriptpath, arg_str_base, srcfp),
-                                apply_reg,
-                                [srcfp, args]
-                            )
-                            task_queue.append(task)
+        if src.endswith('.txt'):
+            with open(src) as fh:
+                srcfps = [line.strip() for line in fh if line.strip()]
+        else:
+            srcfps = [src]
+        candidates = ((srcfp, os.path.isfile, None) for srcfp in srcfps)
+    else:
+        candidates = _iter_listed_rasters(src, args.dstdir)
+
+    if args.job_array:
+        ## write task commands to the array manifest as rasters are found instead of holding a Task
+        ## for every raster in memory, then submit the whole manifest as one job
+        try:
+            task_handler = taskhandler.get_scheduler_taskhandler(args.scheduler, qsubpath)
+        except RuntimeError as e:
+            logger.error(e)
+            return
+        tm = datetime.now().strftime("%Y%m%d%H%M%S")
+        manifest_path = os.path.join(task_dir, 'reg_tasks_{}.txt'.format(tm))
+        src_txt_base = os.path.join(task_dir, 'reg_src_{}'.format(tm))
+        if not args.dryrun:
+            logger.info("Writing task manifest: {}".format(manifest_path))
+        num_rasters, num_tasks = _write_array_manifest(candidates, manifest_path, src_txt_base,
+                                                       scriptpath, arg_str_base, args)
+        logger.info('Number of incomplete tasks: {}'.format(num_rasters))
+        if num_tasks > 0:
+            logger.info('Number of jobs: {}'.format(num_tasks))
+            logger.info("Submitting Tasks")
+            task_handler.submit_array(manifest_path, num_tasks, 'Reg', args.array_limit, dryrun=args.dryrun)
+        else:
+            logger.info("No tasks found to process")
+        return
+
+    for srcfp, exists, entry in candidates:
+        task = _make_task(srcfp, exists, i+1, scriptpath, arg_str_base, args)
+        if task:
+            i+=1
+            if weigh_tasks:
+                ## a dangling symlink cannot be sized; it keeps the default weight of 0 and fails in its own task
+                try:
+                    task.weight = entry.stat().st_size if entry else os.path.getsize(srcfp)
+                except OSError:
+                    pass
+            task_queue.append(task)
     
     logger.info('Number of incomplete tasks: {}'.format(i))
+
+    #### Bundle rasters into text files so each job registers several in one python process
+    if args.tasks_per_job and len(task_queue) > 0:
+        tm = datetime.now()
+        batch_queue = []
+        for j in range(0, len(task_queue), args.tasks_per_job):
+            job_count = len(batch_queue) + 1
+            src_txt = os.path.join(task_dir, 'reg_src_{}_{}.txt'.format(tm.strftime("%Y%m%d%H%M%S"), job_count))
+            job_tasks = task_queue[j:j + args.tasks_per_job]
+            if not args.dryrun:
+                with open(src_txt, 'w') as fh:
+                    for task in job_tasks:
+                        fh.write("{}\n".format(task.method_arg_list[0]))
+            task = taskhandler.Task(
+                os.path.basename(src_txt),
+                'Reg{:04g}'.format(job_count),
+                'python',
+                '{} {} {}'.format(scriptpath, arg_str_base, src_txt),
+                task_weight=sum(task.weight for task in job_tasks)
+            )
+            batch_queue.append(task)
+        task_queue = batch_queue
+        logger.info('Number of jobs: {}'.format(len(task_queue)))
+
     if len(task_queue) > 0:
         logger.info("Submitting Tasks")
         if args.scheduler:
@@ -136,6 +204,8 @@ def main():
                 logger.error(e)
             else:
                 logger.info("Number of child processes to spawn: {0}".format(task_handler.num_processes))
+                ## start the largest rasters first so a big DEM is not left running alone at the end
+                task_queue.sort(key=lambda task: task.weight, reverse=True)
                 if not args.dryrun:
                     task_handler.run_tasks(task_queue)
     
@@ -163,97 +233,269 @@ def main():
     else:
         logger.info("No tasks found to process")
     
+
+
+def _needs_reg(srcfp, exists, dstdir=None):
+    """
+    Return True if srcfp is a SETSM raster with a regfile and no registered output yet
+
+    exists(path) is used to test for the regfile and output raster so directory scans can
+    check against their listings instead of the filesystem
+    """
+    reg_names = get_reg_names(srcfp)
+    if not reg_names:
+        return False
+
+    regfp, dstfp = reg_names
+    if not exists(regfp):
+        logger.info("No regfile found for {}".format(srcfp))
+        return False
+
+    if dstdir:
+        dstfp = os.path.join(dstdir, os.path.basename(dstfp))
+    return not exists(dstfp)
+
+
+def _make_task(srcfp, exists, task_num, scriptpath, arg_str_base, args):
+    """
+    Return a registration Task for srcfp, or None if it does not need registering
+    """
+    if not _needs_reg(srcfp, exists, args.dstdir):
+        return None
+
+    return taskhandler.Task(
+        os.path.basename(srcfp),
+        'Reg{:04g}'.format(task_num),
+        'python',
+        '{} {} {}'.format(scriptpath, arg_str_base, srcfp),
+        apply_reg,
+        [srcfp, args]
+    )
+
+
+def _write_array_manifest(candidates, manifest_path, src_txt_base, scriptpath, arg_str_base, args):
+    """
+    Write a job array manifest line for each raster in candidates that needs registering
+
+    With --tasks-per-job, rasters are appended to numbered <src_txt_base>_N.txt lists as they
+    are found and each list gets one manifest line.  Nothing is written on a dryrun.
+    Returns (number of rasters, number of manifest lines).
+    """
+    num_rasters = 0
+    num_tasks = 0
+    manifest_fh = None if args.dryrun else open(manifest_path, 'w')
+    batch_fh = None
+    try:
+        for srcfp, exists, entry in candidates:
+            if not _needs_reg(srcfp, exists, args.dstdir):
+                continue
+
+            if args.tasks_per_job:
+                if num_rasters % args.tasks_per_job == 0:
+                    num_tasks += 1
+                    task_src = '{}_{}.txt'.format(src_txt_base, num_tasks)
+                    if batch_fh:
+                        batch_fh.close()
+                    if manifest_fh:
+                        batch_fh = open(task_src, 'w')
+                else:
+                    task_src = None
+                if batch_fh:
+                    batch_fh.write("{}\n".format(srcfp))
+            else:
+                num_tasks += 1
+                task_src = srcfp
+
+            if task_src and manifest_fh:
+                manifest_fh.write('{} {} {}\n'.format(scriptpath, arg_str_base, task_src))
+            num_rasters += 1
+    finally:
+        if batch_fh:
+            batch_fh.close()
+        if manifest_fh:
+            manifest_fh.close()
+
+    if num_tasks == 0 and manifest_fh:
+        os.remove(manifest_path)
+    return num_rasters, num_tasks
+
+
+def _iter_listed_rasters(srcdir, dstdir=None):
+    """
+    Yield (srcfp, exists, entry) for each SETSM raster below srcdir
+
+    exists tests paths against the listings of the raster's directory and of dstdir,
+    which is listed once up front
+    """
+    dst_paths = set()
+    if dstdir and os.path.isdir(dstdir):
+        dst_paths = {os.path.join(dstdir, name) for name in os.listdir(dstdir)}
+
+    for dirpath, entries in _scan_dirs(srcdir):
+        paths = {entry.path for entry in entries}
+        exists = lambda p, paths=paths: p in paths or p in dst_paths
+        for entry in entries:
+            if entry.name.endswith(raster_suffixes):
+                yield entry.path, exists, entry
+
+
+def get_reg_names(srcfp):
+    """
+    Return the (regfile, output raster) paths for a SETSM dem, matchtag, or ortho raster path
+
+    Works on bare file names as well as paths.  Returns None for any other file.
+    """
+    for suffix in raster_suffixes:
+        if srcfp.endswith(suffix):
+            stem = srcfp[:-len(suffix)]
+            return stem + 'reg.txt', stem + suffix[:-4] + '_reg.tif'
+    return None
+
+
+def get_creation_options(datatype, legacy_lzw=False):
+    """
+    Return GTiff creation options for a registered raster of the given GDAL datatype
+
+    ZSTD uses floating point prediction for DEMs and horizontal differencing for the
+    integer ortho and matchtag rasters.  legacy_lzw gives the LZW options used before.
+    """
+    if legacy_lzw:
+        return ['COMPRESS=LZW', 'TILED=YES']
+
+    if datatype in (gdalconst.GDT_Float32, gdalconst.GDT_Float64):
+        predictor = 3
+    else:
+        predictor = 2
+    return [
+        'COMPRESS=ZSTD',
+        'ZSTD_LEVEL=1',
+        'PREDICTOR={}'.format(predictor),
+        'NUM_THREADS=ALL_CPUS',
+        'TILED=YES',
+        'BLOCKXSIZE=512',
+        'BLOCKYSIZE=512',
+    ]
+
+
+def _scan_dirs(srcdir):
+    """
+    Yield (dirpath, entries) for srcdir and each directory below it
+
+    Uses os.scandir with an explicit stack so entry types come from the directory
+    listing itself rather than a stat() per file as with os.walk.  Entries are the
+    os.DirEntry objects for the directory, so sibling lookups can be done against
+    the listing instead of the filesystem.
+    """
+    stack = [srcdir]
+    while stack:
+        dirpath = stack.pop()
+        with os.scandir(dirpath) as it:
+            entries = list(it)
+        stack.extend(entry.path for entry in entries if entry.is_dir(follow_symlinks=False))
+        yield dirpath, entries
+
     
 def apply_reg(srcfp, args):
     
-    VRTdrv = gdal.GetDriverByName("VRT")
     files_to_remove = []
     
     logger.info("Source raster: {}".format(srcfp))
+    regfp, dstfp = get_reg_names(srcfp)
     if args.dstdir:
-        dstfp = "{}_reg.tif".format(os.path.join(args.dstdir, os.path.basename(os.path.splitext(srcfp)[0])))
-    else:
-        dstfp = "{}_reg.tif".format(os.path.splitext(srcfp)[0])
-    regfp = srcfp.replace('dem.tif','reg.txt').replace('matchtag.tif','reg.txt').replace('ortho.tif','reg.txt')
+        dstfp = os.path.join(args.dstdir, os.path.basename(dstfp))
     reg_vrt = dstfp[:-4]+".vrt"
+    ## outputs are written to a temp file next to dstfp and renamed into place when complete, so an
+    ## interrupted task never leaves a partial _reg.tif that a rerun would treat as finished
     temp_fp = dstfp[:-4]+"_temp.tif"
     
     ## read regfile and get offsets
-    regfh = open(regfp,'r')
-    for line in regfh.readlines():
-        if line.startswith('Translation Vector (dz,dx,dy)(m)='):
-            trans_vector = line.strip().split('=')[1]
-            trans_vector = trans_vector.split(', ')
-            dz, dx, dy = [float(parm.strip()) for parm in trans_vector]
-            logger.info("Translation Vector (dz, dx, dy) (m) = {}, {}, {}".format(dz, dx, dy))
-            break
-    regfh.close()
+    with open(regfp,'r') as regfh:
+        for line in regfh:
+            m = translation_vector_pattern.match(line)
+            if m:
+                dz, dx, dy = [float(parm) for parm in m.groups()]
+                logger.info("Translation Vector (dz, dx, dy) (m) = {}, {}, {}".format(dz, dx, dy))
+                break
+        else:
+            logger.error("No translation vector found in {}".format(regfp))
+            return
+
+    ## a zero translation (dz only applies to DEMs) leaves the raster unchanged, so link or copy it instead of warping
+    if abs(dx) < 1e-9 and abs(dy) < 1e-9 and (abs(dz) < 1e-9 or not srcfp.endswith("dem.tif")):
+        logger.info("Zero translation, linking {} to {}".format(srcfp, dstfp))
+        if not args.dryrun:
+            try:
+                os.link(srcfp, dstfp)
+            except OSError:
+                logger.debug("os.link failed on {}, copying".format(srcfp))
+                shutil.copy2(srcfp, temp_fp)
+                os.replace(temp_fp, dstfp)
+        return
     
     ## open image and built vrt with modified geotransform for x and y offset
     
     sds = gdal.Open(srcfp,gdalconst.GA_ReadOnly)
-    if sds is not None:
-        gtf = sds.GetGeoTransform()
-        xsize = sds.RasterXSize
-        ysize = sds.RasterYSize
-        #print gtf
+    gtf = sds.GetGeoTransform()
+    datatype = sds.GetRasterBand(1).DataType
+    xsize = sds.RasterXSize
+    ysize = sds.RasterYSize
+    #print gtf
+
+    origin_x = gtf[0]
+    origin_y = gtf[3]
+    trans_origin_x = origin_x + dx
+    trans_origin_y = origin_y + dy
+    #print ex, ey
+
+    ##  get new image geom, not nodata trimmed
+    minx = trans_origin_x
+    maxx = minx + xsize * gtf[1]
+    maxy = trans_origin_y
+    miny = maxy + ysize * gtf[5]
     
-        origin_x = gtf[0]
-        origin_y = gtf[3]
-        trans_origin_x = origin_x + dx
-        trans_origin_y = origin_y + dy
-        #print ex, ey
-
-        ##  get new image geom, not nodata trimmed
-        minx = trans_origin_x
-        maxx = minx + xsize * gtf[1]
-        maxy = trans_origin_y
-        miny = maxy + ysize * gtf[5]
-        
-        ring = ogr.Geometry(ogr.wkbLinearRing)
-        ring.AddPoint(minx, miny)
-        ring.AddPoint(minx, maxy)
-        ring.AddPoint(maxx, maxy)
-        ring.AddPoint(maxx, miny)
-        ring.AddPoint(minx, miny)
-        
-        geom = ogr.Geometry(ogr.wkbPolygon)
-        geom.AddGeometry(ring)
-        
-        # -projwin ulx uly lrx lry
-        # -te xmin ymin xmax ymax
-        target_extent = "{} {} {} {}".format(minx, miny, maxx, maxy)
-                
-        vds = VRTdrv.CreateCopy(reg_vrt,sds,0)
-        dgtf = (trans_origin_x,gtf[1],gtf[2],trans_origin_y,gtf[4],gtf[5])
-        vds.SetGeoTransform(dgtf)
-                
+    # -te xmin ymin xmax ymax
+    target_extent = (minx, miny, maxx, maxy)
+            
+    vds = VRTdrv.CreateCopy(reg_vrt,sds,0)
+    dgtf = (trans_origin_x,gtf[1],gtf[2],trans_origin_y,gtf[4],gtf[5])
+    vds.SetGeoTransform(dgtf)
+    
+    ## apply the z offset to valid DEM pixels in the vrt so a single warp writes the final raster.  The
+    ## vrt_sources domain replaces the source CreateCopy made, so each pixel is read once, with the offset.
+    if srcfp.endswith("dem.tif"):
+        band = vds.GetRasterBand(1)
+        nodata = band.GetNoDataValue()
+        if nodata is None:
+            nodata = -9999
+            band.SetNoDataValue(nodata)
+        source_xml = dem_offset_source.format(srcfp=xml_escape(srcfp), dz=dz, nodata=nodata)
+        band.SetMetadata({'source_0': source_xml}, 'vrt_sources')
+
     vds = None
     sds = None
     files_to_remove.append(reg_vrt)
     
-    if not srcfp.endswith("dem.tif"):
-        if os.path.isfile(reg_vrt) and not os.path.isfile(temp_fp):
-            cmd = 'gdalwarp -wo NUM_THREADS=ALL_CPUS -ovr NONE -te {} -co COMPRESS=LZW -co TILED=YES "{}" "{}"'.format(target_extent,reg_vrt,dstfp)
-            if not args.dryrun:
-                logger.info(cmd)
-                subprocess.call(cmd,shell=True)
-    
-    else:
-        if os.path.isfile(reg_vrt) and not os.path.isfile(temp_fp):
-            cmd = 'gdalwarp -wo NUM_THREADS=ALL_CPUS -ovr NONE -te {} -co COMPRESS=LZW -co TILED=YES "{}" "{}"'.format(target_extent,reg_vrt,temp_fp)
-            if not args.dryrun:
-                logger.info(cmd)
-                subprocess.call(cmd,shell=True)
-                
-        ## use gdal_calc to modify for z offset if raster is a DEM only
-        if os.path.isfile(temp_fp) and not os.path.isfile(dstfp):
-            cmd = 'gdal_calc.py --co COMPRESS=LZW --co TILED=YES --NoDataValue=-9999 -A {} --calc "A+{}" --outfile {}'.format(temp_fp,dz,dstfp)
-            if not args.dryrun:
-                logger.info(cmd)
-                subprocess.call(cmd,shell=True)
-        
-        files_to_remove.append(temp_fp)
+    if os.path.isfile(reg_vrt):
+        ## warp in-process rather than paying for a gdalwarp interpreter and driver startup per raster.
+        ## Multithreaded warping overlaps block reads/writes with warp computation.
+        warp_options = gdal.WarpOptions(
+            options=['-ovr', 'NONE'],
+            outputBounds=target_extent,
+            warpOptions=['NUM_THREADS=ALL_CPUS'],
+            multithread=True,
+            warpMemoryLimit=1024,
+            creationOptions=get_creation_options(datatype, args.legacy_lzw),
+        )
+        if not args.dryrun:
+            logger.info("Warping {} to {}".format(reg_vrt, dstfp))
+            ## the returned dataset is not kept, so it is closed and flushed before the rename
+            try:
+                gdal.Warp(temp_fp, reg_vrt, options=warp_options)
+            except RuntimeError as e:
+                logger.error("Cannot warp {}: {}".format(reg_vrt, e))
+                files_to_remove.append(temp_fp)
+            else:
+                os.replace(temp_fp, dstfp)
         
     for f in files_to_remove:
         try:
@@ -1,14 +1,26 @@
 #!/usr/bin/env python3
 
 import argparse
+import concurrent.futures
 import datetime
+import functools
+import importlib.util
 import json
 import logging
+import multiprocessing as mp
 import os
 import pathlib
 import sys
+import threading
 
-from lib import utils, dem, VERSION, SHORT_VERSION
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from lib import utils, dem, taskhandler, VERSION, SHORT_VERSION
 
 DOMAIN_TITLES = {
     "arcticdem": "ArcticDEM",
@@ -16,6 +28,78 @@ DOMAIN_TITLES = {
     "rema": "REMA"
 }
 
+COG_TYPE = "image/tiff; application=geotiff; profile=cloud-optimized"
+
+# Item fields that are the same for every item.  The lists are shared between items, nothing modifies them.
+STAC_EXTENSIONS = [ "https://stac-extensions.github.io/projection/v1.0.0/schema.json" ]
+STRIP_DESCRIPTION = "Digital surface models from photogrammetric elevation extraction using the SETSM algorithm.  The DEM strips are a time-stamped product suited to time-series analysis."
+MOSAIC_DESCRIPTION = "Digital surface model mosaic from photogrammetric elevation extraction using the SETSM algorithm.  The mosaic tiles are a composite product using DEM strips from varying collection times."
+
+# Strip assets: name -> (file suffix after the strip ID, static asset fields).  The href is filled in per item
+# and the dem title takes the resolution.
+STRIP_ASSETS = {
+    "hillshade": ("_dem_10m_shade.tif", {
+        "title": "10m hillshade", "href": None, "type": COG_TYPE, "roles": [ "overview", "visual" ]}),
+    "hillshade_masked": ("_dem_10m_shade_masked.tif", {
+        "title": "Masked 10m hillshade", "href": None, "type": COG_TYPE, "roles": [ "overview", "visual" ]}),
+    "dem": ("_dem.tif", {
+        "title": None, "href": None, "type": COG_TYPE, "roles": [ "data" ]}),
+    "mask": ("_bitmask.tif", {
+        "title": "Valid data mask", "href": None, "type": COG_TYPE,
+        "roles": [ "metadata", "data-mask", "land-water", "water-mask", "cloud" ]}),
+    "matchtag": ("_matchtag.tif", {
+        "title": "Match point mask", "href": None, "type": COG_TYPE, "roles": [ "metadata", "matchtag" ]}),
+    "metadata": ("_mdf.txt", {
+        "title": "Metadata", "href": None, "type": "text/plain", "roles": [ "metadata" ]}),
+    "readme": ("_readme.txt", {
+        "title": "Readme", "href": None, "type": "text/plain", "roles": [ "metadata" ]}),
+}
+
+# Number of directories listed at once when searching for DEMs.  Listing is mostly waiting on the file system.
+SCAN_THREADS = 8
+
+# Most item writes and validations waiting on the io pool at once.  On a slow file system the build then waits
+# for writes to catch up instead of piling serialized items up in memory.
+IO_BACKLOG = 64
+io_slots = threading.BoundedSemaphore(IO_BACKLOG)
+
+submission_script_map = {
+    'pbs': 'pbs_resample.sh',
+    'slurm': 'slurm_resample.sh'
+}
+
+# Mosaic tile assets, as for strips but with the suffix after the tile ID
+MOSAIC_ASSETS = {
+    "hillshade": ("_browse.tif", {
+        "title": "Hillshade", "href": None, "type": COG_TYPE, "roles": [ "overview", "visual" ]}),
+    "dem": ("_dem.tif", {
+        "title": None, "href": None, "type": COG_TYPE, "roles": [ "data" ]}),
+    "count": ("_count.tif", {
+        "title": "Count", "href": None, "type": COG_TYPE, "roles": [ "metadata", "count" ]}),
+    #"count_matchtag": ("_countmt.tif", {
+    #    "title": "Count of Match points", "href": None, "type": COG_TYPE, "roles": [ "metadata", "matchtag" ]}),
+    "mad": ("_mad.tif", {
+        "title": "Median Absolute Deviation", "href": None, "type": COG_TYPE, "roles": [ "metadata", "mad" ]}),
+    "maxdate": ("_maxdate.tif", {
+        "title": "Max date", "href": None, "type": COG_TYPE, "roles": [ "metadata", "date" ]}),
+    "mindate": ("_mindate.tif", {
+        "title": "Min date", "href": None, "type": COG_TYPE, "roles": [ "metadata", "date" ]}),
+    "datamask": ("_datamask.tif", {
+        "title": "Valid data mask", "href": None, "type": COG_TYPE, "roles": [ "metadata", "data-mask" ]}),
+    "metadata": ("_meta.txt", {
+        "title": "Metadata", "href": None, "type": "text/plain", "roles": [ "metadata" ]}),
+}
+
+# ArcticDEM v3 mosaic tile assets.  The metadata file is named by supertile and its href is set per item.
+MOSAIC_V3_ASSETS = {
+    "browse": ("_reg_dem_browse.tif", {
+        "title": "Browse", "href": None, "type": COG_TYPE, "roles": [ "overview", "visual" ]}),
+    "dem": ("_reg_dem.tif", {
+        "title": None, "href": None, "type": COG_TYPE, "roles": [ "data" ]}),
+    "metadata": (None, {
+        "title": "Metadata", "href": None, "type": "text/plain", "roles": [ "metadata" ]}),
+}
+
 #### Create Logger
 logger = logging.getLogger("logger")
 logger.setLevel(logging.DEBUG)
@@ -35,16 +119,25 @@ def main():
     parser.add_argument('--overwrite', action='store_true', default=False,
                         help="overwrite existing stac item json")
 
-    # Disable: this isn't really useful because pystac wants to validate all the links, many of which are absolute
-    #          and won't exist until the whole catalog is generated and published.
-    #parser.add_argument('--validate', action='store_true', default=False,
-    #                    help="validate stac item json")
-    parser.add_argument('--stac-base-dir', help="base directory to write stac JSON files, otherwise write next to images")
+    # Items are validated from the in-memory dict against the STAC schemas only.  Reading the written file back
+    # is not useful because pystac wants to resolve the links, many of which are absolute and won't exist until
+    # the whole catalog is generated and published.
+    parser.add_argument('--validate', action='store_true', default=False,
+                        help="validate stac item json against the STAC schemas (requires pystac)")
+    parser.add_argument('--stac-base-dir', help="base directory to write stac JSON files, otherwise write next to images. "
+                        "Scheduler runs with --tasks-per-job write their stac_src_*.txt DEM lists here, otherwise to the "
+                        "current directory")
     parser.add_argument('--stac-base-url', help="STAC Catalog Base URL", default="https://pgc-opendata-dems.s3.us-west-2.amazonaws.com")
     parser.add_argument('--domain', help="PGC Domain (arcticdem,earthdem,rema)", required=True, choices=DOMAIN_TITLES.keys())
+    parser.add_argument("--dryrun", action="store_true", default=False,
+                        help="print actions without executing")
     parser.add_argument('--version', action='version', version=f"Current version: {SHORT_VERSION}",
                         help='print version and exit')
 
+    pos_arg_keys = ['src']
+    arg_keys_to_remove = utils.SCHEDULER_ARGS + ['dryrun']
+    utils.add_scheduler_options(parser, submission_script_map, include_tasks_per_job=True)
+
     #### Parse Arguments
     scriptpath = os.path.abspath(sys.argv[0])
     args = parser.parse_args()
@@ -57,8 +150,14 @@ def main():
     if not args.domain in DOMAIN_TITLES:
         parser.error("Domain must be one of: " + ", ".join(DOMAIN_TITLES.keys()))
 
-    #if args.validate:
-    #    import pystac
+    if args.parallel_processes < 1:
+        parser.error("--parallel-processes must be greater than 0")
+
+    ## Verify qsubscript
+    qsubpath = utils.verify_scheduler_args(parser, args, scriptpath, submission_script_map)
+
+    if args.validate and importlib.util.find_spec("pystac") is None:
+        parser.error("--validate requires the pystac package")
 
     ## Setup Logging options
     if args.v:
@@ -82,109 +181,316 @@ def main():
         scene_paths.append(src)
 
     elif os.path.isfile(src) and src.endswith('.txt'):
-        fh = open(src,'r')
-        for line in fh.readlines():
-            sceneid = line.strip()
-            scene_paths.append(sceneid)
+        # read and split in one go so long manifests are not parsed a Python line at a time.  splitlines() also
+        # splits CRLF manifests, and blank lines are dropped.
+        with open(src,'r') as fh:
+            scene_paths.extend(filter(None, map(str.strip, fh.read().splitlines())))
 
     elif os.path.isdir(src):
-        for root,dirs,files in os.walk(src):
-            for f in files:
-                if f.endswith("_dem.tif") and "m_" in f:
-                    srcfp = os.path.join(root,f)
-                    logger.debug(srcfp)
-                    scene_paths.append(srcfp)
+        # items written next to their DEM can be checked against the directory listing instead of a stat each
+        skip_existing = not (args.overwrite or args.validate or args.stac_base_dir)
+        for srcfp in find_dems(src, skip_existing_items=skip_existing):
+            if args.v: # the logger passes all levels to the handler, so skip the call unless it is shown
+                logger.debug(srcfp)
+            scene_paths.append(srcfp)
 
     else:
         logger.error("src must be a directory")
 
     scene_paths.sort() # not strictly necessary, but makes logs easier to read
+
+    #### Submit scheduler jobs that rerun this script on one DEM, or on a text file of --tasks-per-job DEMs
+    if args.scheduler:
+        arg_str_base = taskhandler.convert_optional_args_to_string(args, pos_arg_keys, arg_keys_to_remove)
+        # DEM lists go with the output, or the current directory, never into the source DEM tree
+        task_dir = os.path.abspath(args.stac_base_dir) if args.stac_base_dir else os.getcwd()
+        tm = datetime.datetime.now()
+        task_queue = []
+        if args.tasks_per_job:
+            if not args.dryrun:
+                pathlib.Path(task_dir).mkdir(parents=True, exist_ok=True)
+            for i in range(0, len(scene_paths), args.tasks_per_job):
+                job_count = len(task_queue) + 1
+                src_txt = os.path.join(task_dir, 'stac_src_{}_{}.txt'.format(tm.strftime("%Y%m%d%H%M%S"), job_count))
+                if not args.dryrun:
+                    with open(src_txt, 'w') as fh:
+                        for sp in scene_paths[i:i + args.tasks_per_job]:
+                            fh.write("{}\n".format(sp))
+                task_queue.append(taskhandler.Task(
+                    os.path.basename(src_txt),
+                    'Stac{:04g}'.format(job_count),
+                    'python',
+                    '{} {} {}'.format(scriptpath, arg_str_base, src_txt)
+                ))
+        else:
+            for sp in scene_paths:
+                task_queue.append(taskhandler.Task(
+                    os.path.basename(sp),
+                    'Stac{:04g}'.format(len(task_queue) + 1),
+                    'python',
+                    '{} {} {}'.format(scriptpath, arg_str_base, sp)
+                ))
+
+        logger.info('Number of jobs: {}'.format(len(task_queue)))
+        if len(task_queue) > 0:
+            try:
+                task_handler = taskhandler.get_scheduler_taskhandler(args.scheduler, qsubpath)
+            except RuntimeError as e:
+                logger.error(e)
+            else:
+                logger.info("Submitting Tasks")
+                if args.dryrun:
+                    for task in task_queue:
+                        logger.info("Would submit {}: {}".format(task.abrv, task.cmd))
+                else:
+                    task_handler.run_tasks(task_queue)
+        return
+
+    if args.dryrun:
+        logger.info('Number of DEMs to process: {}'.format(len(scene_paths)))
+        return
+
     logger.info('Reading rasters')
     j = 0
     total = len(scene_paths)
-    scenes = []
-    for sp in scene_paths:
+    published = iso8601(datetime.datetime.now(datetime.timezone.utc)) # one timestamp for every item in the run
+    process = functools.partial(process_scene, args=args, published=published)
+    if args.parallel_processes > 1:
+        ## each DEM is independent, so items are built in worker processes and finish in any order
+        logger.info("Number of child processes to spawn: {0}".format(args.parallel_processes))
+        pool = mp.Pool(args.parallel_processes)
         try:
-            if pathlib.Path(sp).name.startswith('SETSM_'):
-                # assume sp is a SETSM strip
-                raster = dem.SetsmDem(sp)
-                raster.get_dem_info()
+            results = pool.imap_unordered(process, scene_paths, 16)
+            for err in results:
+                if err:
+                    logger.error(err)
+                else:
+                    j+=1
+                    utils.progress(j, total, "DEMs identified")
+        except KeyboardInterrupt:
+            pool.terminate()
+            raise
+        else:
+            pool.close()
+        pool.join()
+    else:
+        ## item files are written and validated on threads while GDAL reads the next DEM
+        io_pool = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+        for sp in scene_paths:
+            err = process(sp, io_pool=io_pool)
+            if err:
+                logger.error(err)
+            else:
+                j+=1
+                utils.progress(j, total, "DEMs identified")
+        io_pool.shutdown(wait=True)
+
+
+# Builds, writes, and optionally validates the STAC item for one DEM.  Returns None if the item was built or an
+# error message to be logged by the caller, so worker processes do not write build errors over the progress bar.
+def process_scene(sp, args, published, io_pool=None):
+    # existing items whose path is known from the file name are skipped without opening the raster
+    if not (args.overwrite or args.validate):
+        known_path = predict_item_path(sp, args)
+        if known_path and os.path.exists(known_path):
+            return None
+
+    try:
+        if os.path.basename(sp).startswith('SETSM_'):
+            # assume sp is a SETSM strip
+            raster = dem.SetsmDem(sp)
+            raster.get_dem_info()
+
+            stac_item = build_strip_stac_item(args.stac_base_url, args.domain, raster, published)
+            item_relpath = strip_item_relpath(args.domain, raster)
+        else:
+            # assume sp is a mosaic tile
+            raster = dem.SetsmTile(sp)
+            raster.get_dem_info(get_stats=False) # items have no elevation stats, skip reading the raster for them
 
-                stac_item = build_strip_stac_item(args.stac_base_url, args.domain, raster)
+            if raster.release_version == "3.0":
+                # special case for ArcticDEM mosaics v3.0
+                stac_item = build_mosaic_v3_stac_item(args.stac_base_url, args.domain, raster, published)
             else:
-                # assume sp is a mosaic tile
-                raster = dem.SetsmTile(sp)
-                raster.get_dem_info()
+                stac_item = build_mosaic_stac_item(args.stac_base_url, args.domain, raster, published)
+            item_relpath = mosaic_item_relpath(args.domain, raster)
 
-                if raster.release_version == "3.0":
-                    # special case for ArcticDEM mosaics v3.0
-                    stac_item = build_mosaic_v3_stac_item(args.stac_base_url, args.domain, raster)
-                else:
-                    stac_item = build_mosaic_stac_item(args.stac_base_url, args.domain, raster)
+    except RuntimeError as e:
+        return f'{e} while processing {sp}'
 
-        except RuntimeError as e:
-            logger.error( f'{e} while processing {sp}' )
-        else:
-            j+=1
-            utils.progress(j, total, "DEMs identified")
+    if args.stac_base_dir:
+        stac_item_geojson_path = os.path.join(args.stac_base_dir, item_relpath)
+        os.makedirs(os.path.dirname(stac_item_geojson_path), exist_ok=True)
+    else:
+        stac_item_geojson_path = raster.srcfp.replace("_dem.tif", ".json")
 
-            stac_item_json = json.dumps(stac_item, indent=2, sort_keys=False)
-            #logger.debug(stac_item_json)
+    if not os.path.exists(stac_item_geojson_path) or args.overwrite:
+        logger.debug('Writing %s', stac_item_geojson_path)
+        try:
+            stac_item_json = dump_stac_item(stac_item)
+        except ValueError as e:
+            return f'{e} while processing {sp}'
+        submit_or_run(io_pool, write_stac_item, stac_item_geojson_path, stac_item_json)
 
-            if args.stac_base_dir:
-                stac_item_geojson_path = stac_item["links"][0]["href"].replace(args.stac_base_url, args.stac_base_dir)
-                pathlib.Path(stac_item_geojson_path).parent.mkdir(parents=True, exist_ok=True)
-            else:
-                stac_item_geojson_path = raster.srcfp.replace("_dem.tif", ".json")
+    # validate stac item
+    if args.validate:
+        submit_or_run(io_pool, validate_stac_item, sp, stac_item)
+
+    return None
+
+
+# Returns the path the item for sp will be written to if it follows from the file name alone, otherwise None.
+# Strip items under --stac-base-dir are filed by geocell, which needs the DEM footprint, and mosaic tiles need
+# the release version in their name.
+def predict_item_path(sp, args):
+    if not args.stac_base_dir:
+        return sp.replace("_dem.tif", ".json")
+
+    if os.path.basename(sp).startswith('SETSM_'):
+        return None
+    try:
+        tile = dem.SetsmTile(sp)
+    except RuntimeError:
+        return None
+    if not tile.release_version:
+        return None
+    if tile.release_version != "3.0":
+        tile.release_version = "2.0" # as build_mosaic_stac_item sets it
+    return os.path.join(args.stac_base_dir, mosaic_item_relpath(args.domain, tile))
+
+
+# Runs func(*args) on pool if given, logging any exception it raises, otherwise runs it directly.  Blocks while
+# IO_BACKLOG tasks are waiting on the pool.
+def submit_or_run(pool, func, *args):
+    if pool:
+        io_slots.acquire()
+        pool.submit(func, *args).add_done_callback(finish_background_task)
+    else:
+        func(*args)
+
+
+def finish_background_task(future):
+    io_slots.release()
+    e = future.exception()
+    if e:
+        logger.error(e)
 
-            if not os.path.exists(stac_item_geojson_path) or args.overwrite:
-                with open(stac_item_geojson_path, "w") as f:
-                    logger.debug('Writing '+stac_item_geojson_path)
-                    f.write(stac_item_json)
 
-            # validate stac item
-            #if args.validate:
-            #    pystac_item = pystac.Item.from_file(stac_item_geojson_path)
-            #    for i in pystac_item.validate():
-            #        print(i)
+# Validates the item dict as is.  pystac's validator is created once per process and keeps the schemas it has
+# fetched, and validating the dict skips building an Item from it only to convert it back for validation.
+def validate_stac_item(sp, stac_item):
+    import pystac
+    import pystac.validation
+    try:
+        pystac.validation.validate_dict(stac_item, pystac.STACObjectType.ITEM)
+    except pystac.errors.STACValidationError as e:
+        logger.error(f'{sp} failed validation: {e}')
 
 
-def build_strip_stac_item(base_url, domain, raster):
-    collection_name = f'{domain}-strips-{raster.release_version}-{raster.res_str}'
-    domain_title = DOMAIN_TITLES[domain]
+# Item paths relative to the catalog root, shared by the self link under --stac-base-url and the file written
+# under --stac-base-dir
+def strip_item_relpath(domain, raster):
+    return f"{domain}/strips/{raster.release_version}/{raster.res_str}/{raster.geocell}/{raster.stripid}.json"
+
+
+def mosaic_item_relpath(domain, tile):
+    return f"{domain}/mosaics/v{tile.release_version}/{tile.res}/{tile.supertile_id_no_res}/{tile.tileid}.json"
+
+
+# The parent, collection and root links are the same for every item in a geocell or tile catalog, so they are
+# built once per catalog and shared between items.  Nothing modifies them.
+@functools.lru_cache(maxsize=None)
+def strip_catalog_links(base_url, domain, release_version, res_str, geocell):
+    return (
+        {
+            "rel": "parent",
+            "title": f"Geocell {geocell}",
+            "href": f"../{geocell}.json",
+            "type": "application/json"
+        },
+        {
+            "rel": "collection",
+            "title": f"{DOMAIN_TITLES[domain]} {res_str} DEM Strips, version {release_version}",
+            "href": f"{base_url}/{domain}/strips/{release_version}/{res_str}.json",
+            "type": "application/json"
+        },
+        {
+            "rel": "root",
+            "title": "PGC Data Catalog",
+            "href": f"{base_url}/pgc-data-stac.json",
+            "type": "application/json"
+        }
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def mosaic_catalog_links(base_url, domain, release_version, res, supertile_id_no_res):
+    return (
+        {
+            "rel": "parent",
+            "title": f"Tile Catalog {supertile_id_no_res}",
+            "href": f"../{supertile_id_no_res}.json",
+            "type": "application/json"
+        },
+        {
+            "rel": "collection",
+            "title": f"Resolution Collection {DOMAIN_TITLES[domain]} {res} DEM Mosaics, version {release_version}",
+            "href": f"{base_url}/{domain}/mosaic/{release_version}/{res}.json",
+            "type": "application/json"
+        },
+        {
+            "rel": "root",
+            "title": "PGC Data Catalog",
+            "href": f"{base_url}/pgc-data-stac.json",
+            "type": "application/json"
+        }
+    )
+
+
+def build_strip_stac_item(base_url, domain, raster, published):
+    stripid = raster.stripid
+    release_version = raster.release_version
+    res_str = raster.res_str
+    geocell = raster.geocell
+    href_prefix = "./" + stripid
+
+    collection_name = f'{domain}-strips-{release_version}-{res_str}'
     start_time = min(raster.avg_acqtime1, raster.avg_acqtime2)
     end_time   = max(raster.avg_acqtime1, raster.avg_acqtime2)
 
     # validate stripid matches metadata - stripid is built off the filename in dem.py
-    id_parts = raster.stripid.split('_')
-    if raster.res_str != id_parts[6]:
-        raise RuntimeError(f"Strip ID resolution mismatch: {raster.res_str} != {id_parts[6]}")
-    if raster.release_version != id_parts[1]:
-        raise RuntimeError(f"Strip ID version mismatch: v{raster.release_version} != {id_parts[1]}")
+    id_parts = stripid.split('_')
+    if res_str != id_parts[6]:
+        raise RuntimeError(f"Strip ID resolution mismatch: {res_str} != {id_parts[6]}")
+    if release_version != id_parts[1]:
+        raise RuntimeError(f"Strip ID version mismatch: v{release_version} != {id_parts[1]}")
+
+    # reprojected once, and its points read once for both the bbox and the geometry
+    bbox, geometry = get_geojson_footprint(raster.get_geom_wgs84())
 
     stac_item = {
         "type": "Feature",
         "stac_version": "1.0.0",
-        "stac_extensions": [ "https://stac-extensions.github.io/projection/v1.0.0/schema.json" ],
-        "id": raster.stripid,
-        "bbox": get_geojson_bbox(raster.get_geom_wgs84()),
+        "stac_extensions": STAC_EXTENSIONS,
+        "id": stripid,
+        "bbox": bbox,
         "collection": collection_name,
         "properties": {
-            "title": raster.stripid,
-            "description": "Digital surface models from photogrammetric elevation extraction using the SETSM algorithm.  The DEM strips are a time-stamped product suited to time-series analysis.",
-            "created": iso8601(raster.creation_date, f"{raster.stripid} creation_date"), # are these actually in UTC, does it matter?
-            "published": iso8601(datetime.datetime.utcnow()), # now
+            "title": stripid,
+            "description": STRIP_DESCRIPTION,
+            "created": iso8601(raster.creation_date, f"{stripid} creation_date"), # are these actually in UTC, does it matter?
+            "published": published,
             "datetime": iso8601(start_time), # this is only required if start_datetime/end_datetime are not specified
-            "start_datetime": iso8601(start_time, f"{raster.stripid} start_time"),
-            "end_datetime": iso8601(end_time, f"{raster.stripid} end_time"),
+            "start_datetime": iso8601(start_time, f"{stripid} start_time"),
+            "end_datetime": iso8601(end_time, f"{stripid} end_time"),
             "instruments": [ raster.sensor1, raster.sensor2 ],
             "constellation": "maxar",
             "gsd": (raster.xres + raster.yres)/2.0, ## dem.res is a string ('2m','50cm'), gsd be a float (2.0).
             "proj:epsg": raster.epsg,
             "pgc:image_ids": [ raster.catid1, raster.catid2 ],
-            "pgc:geocell": raster.geocell,
-            "pgc:is_xtrack": raster.is_xtrack == True,
-            "pgc:is_lsf": raster.is_lsf == True,
+            "pgc:geocell": geocell,
+            "pgc:is_xtrack": bool(raster.is_xtrack),
+            "pgc:is_lsf": bool(raster.is_lsf),
             "pgc:setsm_version": raster.algm_version,
             "pgc:s2s_version": raster.s2s_version,
             "pgc:rmse": raster.rmse,
@@ -206,88 +512,27 @@ def build_strip_stac_item(base_url, domain, raster):
         "links": [
             {
                 "rel": "self",
-                "href": f"{base_url}/{domain}/strips/{raster.release_version}/{raster.res_str}/{raster.geocell}/{raster.stripid}.json",
+                "href": f"{base_url}/{strip_item_relpath(domain, raster)}",
                 "type": "application/geo+json"
             },
-            {
-                "rel": "parent",
-                "title": f"Geocell {raster.geocell}",
-                "href": f"../{raster.geocell}.json",
-                "type": "application/json"
-            },
-            {
-                "rel": "collection",
-                "title": f"{domain_title} {raster.res_str} DEM Strips, version {raster.release_version}",
-                "href": f"{base_url}/{domain}/strips/{raster.release_version}/{raster.res_str}.json",
-                "type": "application/json"
-            },
-            {
-                "rel": "root",
-                "title": "PGC Data Catalog",
-                "href": f"{base_url}/pgc-data-stac.json",
-                "type": "application/json"
-            }
+            *strip_catalog_links(base_url, domain, release_version, res_str, geocell)
             ],
-        "assets": {
-            "hillshade": {
-                "title": "10m hillshade",
-                "href": "./"+raster.stripid+"_dem_10m_shade.tif",
-                "type": "image/tiff; application=geotiff; profile=cloud-optimized",
-                "roles": [ "overview", "visual" ]
-
-            },
-            "hillshade_masked": {
-                "title": "Masked 10m hillshade",
-                "href": "./"+raster.stripid+"_dem_10m_shade_masked.tif",
-                "type": "image/tiff; application=geotiff; profile=cloud-optimized",
-                "roles": [ "overview", "visual" ],
-            },
-            "dem": {
-                "title": f"{raster.res_str} DEM",
-                "href": "./"+raster.stripid+"_dem.tif",
-                "type": "image/tiff; application=geotiff; profile=cloud-optimized",
-                "roles": [ "data" ]
-            },
-            "mask": {
-                "title": "Valid data mask",
-                "href": "./"+raster.stripid+"_bitmask.tif",
-                "type": "image/tiff; application=geotiff; profile=cloud-optimized",
-                "roles": [ "metadata", "data-mask", "land-water", "water-mask", "cloud" ]
-            },
-            "matchtag": {
-                "title": "Match point mask",
-                "href": "./"+raster.stripid+"_matchtag.tif",
-                "type": "image/tiff; application=geotiff; profile=cloud-optimized",
-                "roles": [ "metadata", "matchtag" ]
-            },
-            "metadata": {
-                "title": "Metadata",
-                "href": "./"+raster.stripid+"_mdf.txt",
-                "type": "text/plain",
-                "roles": [ "metadata" ]
-            },
-            "readme": {
-                "title": "Readme",
-                "href": "./"+raster.stripid+"_readme.txt",
-                "type": "text/plain",
-                "roles": [ "metadata" ]
-            }
-        },
+        "assets": build_assets(STRIP_ASSETS, href_prefix, res_str),
             # Geometries are WGS84 in Lon/Lat order (https://github.com/radiantearth/stac-spec/blob/master/item-spec/item-spec.md#item-fields)
             # Note: may have to introduce points to make the WGS84 reprojection follow the actual locations well enough
 
             # Geometries should be split at the antimeridian (https://datatracker.ietf.org/doc/html/rfc7946#section-3.1.9)
-            "geometry": json.loads(utils.getWrappedGeometry(raster.get_geom_wgs84()).ExportToJson())
+            "geometry": geometry
         }
 
     return stac_item
 
 
-def build_mosaic_stac_item(base_url, domain, tile):
+def build_mosaic_stac_item(base_url, domain, tile, published):
     tile.release_version = "2.0" # TODO: HACK for broken metadata.
     collection_name = f'{domain}-mosaics-v{tile.release_version}-{tile.res}'
-    domain_title = DOMAIN_TITLES[domain]
     gsd = int(tile.res[0:-1]) # strip off trailing 'm'. fails for cm!
+    href_prefix = "./" + tile.tileid
 
     # validate tileid matches metadata - tileid is built off the filename in dem.py
     id_parts = tile.tileid.split('_')
@@ -296,18 +541,21 @@ def build_mosaic_stac_item(base_url, domain, tile):
     if "v"+tile.release_version != id_parts[-1]:
         raise RuntimeError(f"Tile ID version mismatch: v{tile.release_version} != {id_parts[-1]}")
 
+    # reprojected once, and its points read once for both the bbox and the geometry
+    bbox, geometry = get_geojson_footprint(tile.get_geom_wgs84())
+
     stac_item = {
         "type": "Feature",
         "stac_version": "1.0.0",
-        "stac_extensions": [ "https://stac-extensions.github.io/projection/v1.0.0/schema.json" ],
+        "stac_extensions": STAC_EXTENSIONS,
         "id": tile.tileid,
-        "bbox": get_geojson_bbox(tile.get_geom_wgs84()),
+        "bbox": bbox,
         "collection": collection_name,
         "properties": {
             "title": tile.tileid,
-            "description": "Digital surface model mosaic from photogrammetric elevation extraction using the SETSM algorithm.  The mosaic tiles are a composite product using DEM strips from varying collection times.",
+            "description": MOSAIC_DESCRIPTION,
             "created": iso8601(tile.creation_date, tile.tileid),
-            "published": iso8601(datetime.datetime.utcnow()),
+            "published": published,
             "datetime": iso8601(tile.acqdate_min), # this is only required if start_datetime/end_datetime are not specified
             "start_datetime": iso8601(tile.acqdate_min, tile.tileid),
             "end_datetime": iso8601(tile.acqdate_max, tile.tileid),
@@ -325,100 +573,27 @@ def build_mosaic_stac_item(base_url, domain, tile):
         "links": [
             {
                 "rel": "self",
-                "href": f"{base_url}/{domain}/mosaics/v{tile.release_version}/{tile.res}/{tile.supertile_id_no_res}/{tile.tileid}.json",
+                "href": f"{base_url}/{mosaic_item_relpath(domain, tile)}",
                 "type": "application/geo+json"
             },
-            {
-                "rel": "parent",
-                "title": f"Tile Catalog {tile.supertile_id_no_res}",
-                "href": f"../{tile.supertile_id_no_res}.json",
-                "type": "application/json"
-            },
-            {
-                "rel": "collection",
-                "title": f"Resolution Collection {domain_title} {tile.res} DEM Mosaics, version {tile.release_version}",
-                "href": f"{base_url}/{domain}/mosaic/{tile.release_version}/{tile.res}.json",
-                "type": "application/json"
-            },
-            {
-                "rel": "root",
-                "title": "PGC Data Catalog",
-                "href": f"{base_url}/pgc-data-stac.json",
-                "type": "application/json"
-            }
+            *mosaic_catalog_links(base_url, domain, tile.release_version, tile.res, tile.supertile_id_no_res)
             ],
-        "assets": {
-            "hillshade": {
-                "title": "Hillshade",
-                "href": "./"+tile.tileid+"_browse.tif",
-                "type": "image/tiff; application=geotiff; profile=cloud-optimized",
-                "roles": [ "overview", "visual" ]
-
-            },
-            "dem": {
-                "title": f"{tile.res} DEM",
-                "href": "./"+tile.tileid+"_dem.tif",
-                "type": "image/tiff; application=geotiff; profile=cloud-optimized",
-                "roles": [ "data" ]
-            },
-            "count": {
-                "title": "Count",
-                "href": "./"+tile.tileid+"_count.tif",
-                "type": "image/tiff; application=geotiff; profile=cloud-optimized",
-                "roles": [ "metadata", "count" ]
-            },
-            #"count_matchtag": {
-            #    "title": "Count of Match points",
-            #    "href": "./"+tile.tileid+"_countmt.tif",
-            #    "type": "image/tiff; application=geotiff; profile=cloud-optimized",
-            #    "roles": [ "metadata", "matchtag" ]
-            #},
-            "mad": {
-                "title": "Median Absolute Deviation",
-                "href": "./"+tile.tileid+"_mad.tif",
-                "type": "image/tiff; application=geotiff; profile=cloud-optimized",
-                "roles": [ "metadata", "mad" ]
-            },
-            "maxdate": {
-                "title": "Max date",
-                "href": "./"+tile.tileid+"_maxdate.tif",
-                "type": "image/tiff; application=geotiff; profile=cloud-optimized",
-                "roles": [ "metadata", "date" ]
-            },
-            "mindate": {
-                "title": "Min date",
-                "href": "./"+tile.tileid+"_mindate.tif",
-                "type": "image/tiff; application=geotiff; profile=cloud-optimized",
-                "roles": [ "metadata", "date" ]
-            },
-            "datamask": {
-                "title": "Valid data mask",
-                "href": "./" + tile.tileid + "_datamask.tif",
-                "type": "image/tiff; application=geotiff; profile=cloud-optimized",
-                "roles": [ "metadata", "data-mask" ]
-            },
-            "metadata": {
-                "title": "Metadata",
-                "href": "./"+tile.tileid+"_meta.txt",
-                "type": "text/plain",
-                "roles": [ "metadata" ]
-            }
-        },
+        "assets": build_assets(MOSAIC_ASSETS, href_prefix, tile.res),
             # Geometries are WGS84 in Lon/Lat order (https://github.com/radiantearth/stac-spec/blob/master/item-spec/item-spec.md#item-fields)
             # Note: may have to introduce points to make the WGS84 reprojection follow the actual locations well enough
 
             # Geometries should be split at the antimeridian (https://datatracker.ietf.org/doc/html/rfc7946#section-3.1.9)
-            "geometry": json.loads(utils.getWrappedGeometry(tile.get_geom_wgs84()).ExportToJson())
+            "geometry": geometry
         }
 
     return stac_item
 
 
 # For ArcticDEM v3 mosaics
-def build_mosaic_v3_stac_item(base_url, domain, tile):
+def build_mosaic_v3_stac_item(base_url, domain, tile, published):
     collection_name = f'{domain}-mosaics-v{tile.release_version}-{tile.res}'
-    domain_title = DOMAIN_TITLES[domain]
     gsd = int(tile.res[0:-1]) # strip off trailing 'm'. fails for cm!
+    href_prefix = "./" + tile.tileid
 
     # validate tileid matches metadata - tileid is built off the filename in dem.py
     id_parts = tile.tileid.split('_')
@@ -427,18 +602,21 @@ def build_mosaic_v3_stac_item(base_url, domain, tile):
     if "v"+tile.release_version != id_parts[-1]:
         raise RuntimeError(f"Tile ID version mismatch: v{tile.release_version} != {id_parts[-1]}")
 
+    # reprojected once, and its points read once for both the bbox and the geometry
+    bbox, geometry = get_geojson_footprint(tile.get_geom_wgs84())
+
     stac_item = {
         "type": "Feature",
         "stac_version": "1.0.0",
-        "stac_extensions": [ "https://stac-extensions.github.io/projection/v1.0.0/schema.json" ],
+        "stac_extensions": STAC_EXTENSIONS,
         "id": tile.tileid,
-        "bbox": get_geojson_bbox(tile.get_geom_wgs84()),
+        "bbox": bbox,
         "collection": collection_name,
         "properties": {
             "title": tile.tileid,
-            "description": "Digital surface model mosaic from photogrammetric elevation extraction using the SETSM algorithm.  The mosaic tiles are a composite product using DEM strips from varying collection times.",
+            "description": MOSAIC_DESCRIPTION,
             "created": iso8601(tile.creation_date, f"{tile.tileid} creation_date"),
-            "published": iso8601(datetime.datetime.utcnow()),
+            "published": published,
             "datetime": iso8601(tile.acqdate_min), # this is only required if start_datetime/end_datetime are not specified
             "start_datetime": iso8601(tile.acqdate_min, f"{tile.tileid} acqdate_min"),
             "end_datetime": iso8601(tile.acqdate_max, f"{tile.tileid} acqdate_max"),
@@ -456,56 +634,21 @@ def build_mosaic_v3_stac_item(base_url, domain, tile):
         "links": [
             {
                 "rel": "self",
-                "href": f"{base_url}/{domain}/mosaics/v{tile.release_version}/{tile.res}/{tile.supertile_id_no_res}/{tile.tileid}.json",
+                "href": f"{base_url}/{mosaic_item_relpath(domain, tile)}",
                 "type": "application/geo+json"
             },
-            {
-                "rel": "parent",
-                "title": f"Tile Catalog {tile.supertile_id_no_res}",
-                "href": f"../{tile.supertile_id_no_res}.json",
-                "type": "application/json"
-            },
-            {
-                "rel": "collection",
-                "title": f"Resolution Collection {domain_title} {tile.res} DEM Mosaics, version {tile.release_version}",
-                "href": f"{base_url}/{domain}/mosaic/{tile.release_version}/{tile.res}.json",
-                "type": "application/json"
-            },
-            {
-                "rel": "root",
-                "title": "PGC Data Catalog",
-                "href": f"{base_url}/pgc-data-stac.json",
-                "type": "application/json"
-            }
+            *mosaic_catalog_links(base_url, domain, tile.release_version, tile.res, tile.supertile_id_no_res)
             ],
-        "assets": {
-            "browse": {
-                "title": "Browse",
-                "href": "./"+tile.tileid+"_reg_dem_browse.tif",
-                "type": "image/tiff; application=geotiff; profile=cloud-optimized",
-                "roles": [ "overview", "visual" ]
-
-            },
-            "dem": {
-                "title": f"{tile.res} DEM",
-                "href": "./"+tile.tileid+"_reg_dem.tif",
-                "type": "image/tiff; application=geotiff; profile=cloud-optimized",
-                "roles": [ "data" ]
-            },
-            "metadata": {
-                "title": "Metadata",
-                "href": f"./{tile.supertile_id}_v{tile.release_version}_dem_meta.txt",
-                "type": "text/plain",
-                "roles": [ "metadata" ]
-            }
-        },
+        "assets": build_assets(MOSAIC_V3_ASSETS, href_prefix, tile.res),
             # Geometries are WGS84 in Lon/Lat order (https://github.com/radiantearth/stac-spec/blob/master/item-spec/item-spec.md#item-fields)
             # Note: may have to introduce points to make the WGS84 reprojection follow the actual locations well enough
 
             # Geometries should be split at the antimeridian (https://datatracker.ietf.org/doc/html/rfc7946#section-3.1.9)
-            "geometry": json.loads(utils.getWrappedGeometry(tile.get_geom_wgs84()).ExportToJson())
+            "geometry": geometry
         }
 
+    stac_item["assets"]["metadata"]["href"] = f"./{tile.supertile_id}_v{tile.release_version}_dem_meta.txt"
+
     # _reg_dem_browse.tif only exists for 2m, remove for other resolutions
     if tile.res != "2m":
         del stac_item["assets"]["browse"]
@@ -513,30 +656,109 @@ def build_mosaic_v3_stac_item(base_url, domain, tile):
     return stac_item
 
 
-def get_geojson_bbox(src_geom):
-    # Note: bbox of geometries that cross the antimeridian are represented by minx > maxx
-    # https://datatracker.ietf.org/doc/html/rfc7946#section-5.2
+# Builds the assets of an item from one of the asset tables: each asset gets the href of its file next to the
+# item, and the dem asset is titled with the resolution.  Assets without a suffix are left for the caller.
+def build_assets(asset_table, href_prefix, res):
+    assets = {name: {**asset, "href": href_prefix+suffix if suffix else None}
+              for name, (suffix, asset) in asset_table.items()}
+    assets["dem"]["title"] = f"{res} DEM"
+    return assets
 
-    ring = src_geom.GetGeometryRef(0) ### assumes a 1 part polygon
-    minx = miny = 9999
-    maxx = maxy = -9999
-    crosses_180 = False
-    for i in range(0, ring.GetPointCount()-1):
-        pt1 = ring.GetPoint(i)
-        pt2 = ring.GetPoint(i+1)
-
-        minx = min([ pt1[0], pt2[0], minx ])
-        maxx = max([ pt1[0], pt2[0], maxx ])
-        miny = min([ pt1[1], pt2[1], miny ])
-        maxy = max([ pt1[1], pt2[1], maxy ])
 
-        if (pt1[0] > 0) - (pt1[0] < 0) != (pt2[0] > 0) - (pt2[0] < 0):
-            crosses_180 = True
+# Yields the paths of DEMs below srcdir.  Directories are listed with os.scandir on a thread pool, so the listings
+# of sibling directories overlap, and files are matched on their DirEntry names without a stat.  Paths come in
+# no particular order.  With skip_existing_items, DEMs whose item json is in the same listing are left out.
+def find_dems(srcdir, skip_existing_items=False):
 
-    if crosses_180:
-        return [ maxx, miny, minx, maxy ]
+    def list_dir(path):
+        subdirs = []
+        dems = []
+        names = set()
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    # like os.walk, linked directories are not descended into
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    else:
+                        names.add(entry.name)
+                        if entry.name.endswith("_dem.tif") and "m_" in entry.name:
+                            dems.append(entry)
+        except OSError as e:
+            logger.error(f"Cannot list {path}: {e}")
+        if skip_existing_items:
+            dems = [entry for entry in dems if entry.name.replace("_dem.tif", ".json") not in names]
+        return subdirs, [entry.path for entry in dems]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=SCAN_THREADS) as executor:
+        pending = {executor.submit(list_dir, srcdir)}
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                subdirs, dems = future.result()
+                pending.update(executor.submit(list_dir, d) for d in subdirs)
+                yield from dems
+
+
+# Returns the GeoJSON bbox and MultiPolygon geometry of a WGS84 footprint, reading its points once.  Footprints at
+# most 180 degrees wide cannot cross the antimeridian and are returned as a one-part MultiPolygon of their ring.
+# Wider ones are tested for crossings and split at 180 (https://datatracker.ietf.org/doc/html/rfc7946#section-3.1.9).
+# Coordinates are the ring's doubles as is; OGR's ExportToJson, used before, rounded them to 15 decimal places.
+def get_geojson_footprint(src_geom):
+    ring = src_geom.GetGeometryRef(0) ### assumes a 1 part polygon
+    minx, maxx, miny, maxy = ring.GetEnvelope()
+    pts = np.asarray(ring.GetPoints(), dtype=np.float64)[:, :2]
 
-    return [ minx, miny, maxx, maxy ]
+    if maxx - minx <= 180:
+        bbox = [ minx, miny, maxx, maxy ]
+        parts = [ pts.tolist() ]
+    else:
+        # it crosses if x has opposite signs at any two consecutive points.  The bbox of a geometry that crosses
+        # the antimeridian is represented by minx > maxx (https://datatracker.ietf.org/doc/html/rfc7946#section-5.2)
+        xs = pts[:, 0]
+        if np.any(xs[:-1] * xs[1:] < 0):
+            bbox = [ maxx, miny, minx, maxy ]
+        else:
+            bbox = [ minx, miny, maxx, maxy ]
+
+        # same parts as utils.getWrappedGeometry, each closed by repeating its first point
+        parts = [ np.vstack((part, part[:1])).tolist() for part in utils.split_ring_at_180(pts) if len(part) > 0 ]
+
+    geometry = {
+        "type": "MultiPolygon",
+        "coordinates": [ [ part ] for part in parts ]
+    }
+    return bbox, geometry
+
+
+# Encoder for when orjson is not installed, built once rather than per item.  Like orjson it writes non-ASCII
+# text as UTF-8 rather than escaping it, and items are freshly built trees so the cycle check is skipped.
+# NaN and infinity are not valid JSON, so they raise ValueError rather than being written as bare NaN.
+json_encode = json.JSONEncoder(indent=2, ensure_ascii=False, check_circular=False, allow_nan=False).encode
+
+
+# Serializes a STAC item to indented JSON bytes.  orjson is used when installed since it is several times
+# faster than the json module on these items.  Both write 2-space indented JSON with the same structure and
+# values, but the text is not always byte-identical: float formatting can differ (e.g. orjson writes 1e-7
+# where json writes 1e-07), and orjson writes NaN and infinity as null where the fallback raises.
+def dump_stac_item(stac_item):
+    if orjson:
+        return orjson.dumps(stac_item, option=orjson.OPT_INDENT_2)
+    return json_encode(stac_item).encode('utf-8')
+
+
+# Writes serialized item bytes to a temp file with unbuffered os.write calls and renames it into place, so a
+# killed run never leaves a truncated item that a rerun would skip as existing.
+def write_stac_item(path, payload):
+    temp_path = path + ".tmp"
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(payload)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+    os.replace(temp_path, path)
 
 
 # Converts date to ISO-8601 format.  Returns None on None vs throwing.
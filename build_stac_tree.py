@@ -7,6 +7,11 @@ import os
 import pathlib
 import sys
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from lib import utils, VERSION, SHORT_VERSION
 
 DOMAINS = {
@@ -111,8 +116,8 @@ def main():
     for ip in item_paths:
         j+=1
         utils.progress(j, total, "STAC Items identified")
-        with open(ip) as f:
-            stac_item = json.load(f)
+        with open(ip, "rb") as f:
+            stac_item = orjson.loads(f.read()) if orjson else json.load(f)
             stac_item_id = stac_item["id"]
             ids = stac_item["collection"].split("-")
 
@@ -261,10 +266,14 @@ def merge_bbox(bbox1, bbox2):
 
 def write_json(stac_obj, stac_json_path, overwrite):
     if not os.path.exists(stac_json_path) or overwrite:
-        with open(stac_json_path, "w") as f:
-            logger.info('Writing '+stac_json_path)
-            stac_json = json.dumps(stac_obj, indent=2, sort_keys=False)
-            f.write(stac_json)
+        logger.info('Writing '+stac_json_path)
+        if orjson:
+            with open(stac_json_path, "wb") as f:
+                f.write(orjson.dumps(stac_obj, option=orjson.OPT_INDENT_2))
+        else:
+            # streamed to the file, collections with many item links are not built up as one string first
+            with open(stac_json_path, "w", encoding="utf-8", buffering=1<<20) as f:
+                json.dump(stac_obj, f, indent=2, sort_keys=False)
 
 
 
@@ -6,6 +6,7 @@ dem raster information class and methods
 
 from __future__ import division
 
+import functools
 import logging
 import math
 import os
@@ -722,15 +723,18 @@ class SetsmDem(object):
         if not self.geom or not self.epsg:
             self.get_geom()
 
-        srs = utils.osr_srs_preserve_axis_order(osr.SpatialReference())
-        rc = srs.ImportFromProj4(self.proj4_meta)
-        geom = self.geom.Clone()
+        ## the transformed footprint is kept for the current geom, callers get a copy they are free to modify
+        cached = getattr(self, '_geom_wgs84', None)
+        if cached is None or cached[0] is not self.geom:
+            geom = self.geom.Clone()
+
+            ctf = get_wgs84_transform(self.proj4_meta)
+            if ctf:
+                geom.Transform(ctf)
 
-        if not srs_wgs84.IsSame(srs):
-            ctf = osr.CoordinateTransformation(srs, srs_wgs84)
-            geom.Transform(ctf)
+            cached = self._geom_wgs84 = (self.geom, geom)
 
-        return geom
+        return cached[1].Clone()
 
     def get_geocell(self):
         if not self.geocell:
@@ -738,10 +742,8 @@ class SetsmDem(object):
             centroid = self.geom.Centroid()
 
             ## Convert to wgs84
-            srs = utils.osr_srs_preserve_axis_order(osr.SpatialReference())
-            rc = srs.ImportFromProj4(self.proj4_meta)
-            if not srs_wgs84.IsSame(srs):
-                ctf = osr.CoordinateTransformation(srs, srs_wgs84)
+            ctf = get_wgs84_transform(self.proj4_meta)
+            if ctf:
                 centroid.Transform(ctf)
 
             lat = centroid.GetY()
@@ -1851,9 +1853,10 @@ class SetsmTile(object):
             else:
                 raise RuntimeError("DEM name does not match expected pattern: {}".format(self.srcfn))
 
-    def get_dem_info(self):
+    def get_dem_info(self, get_stats=True):
+        ## get_stats=False skips the elevation statistics, which may need a scan of the raster
 
-        self.get_geom(get_stats=True)
+        self.get_geom(get_stats=get_stats)
 
         try:
             self.filesz_dem = os.path.getsize(self.srcfp) / 1024.0 / 1024 / 1024
@@ -1972,15 +1975,18 @@ class SetsmTile(object):
         if not self.geom or not self.epsg:
             self.get_geom()
 
-        srs = utils.osr_srs_preserve_axis_order(osr.SpatialReference())
-        rc = srs.ImportFromEPSG(self.epsg)
-        geom = self.geom.Clone()
+        ## the transformed footprint is kept for the current geom, callers get a copy they are free to modify
+        cached = getattr(self, '_geom_wgs84', None)
+        if cached is None or cached[0] is not self.geom:
+            geom = self.geom.Clone()
 
-        if not srs_wgs84.IsSame(srs):
-            ctf = osr.CoordinateTransformation(srs, srs_wgs84)
-            geom.Transform(ctf)
+            ctf = get_wgs84_transform(self.epsg)
+            if ctf:
+                geom.Transform(ctf)
 
-        return geom;
+            cached = self._geom_wgs84 = (self.geom, geom)
+
+        return cached[1].Clone()
 
 
     def get_metafile_info(self):
@@ -2245,6 +2251,42 @@ def get_raster_density(raster_fp, geom_area=None, bitmask_fp=None):
         return density
 
 
+@functools.lru_cache(maxsize=128)
+def get_wgs84_transform(src_srs):
+    '''
+    Returns a cached coordinate transformation to WGS84, or None if src_srs is already WGS84.  Building the
+    transformation is much slower than applying it, and DEMs share a handful of projections.  The transformations
+    are shared, so do not use them from several threads at once.
+    Input: proj4 string or EPSG code (int)
+    Output: osr.CoordinateTransformation or None
+    '''
+
+    srs = utils.osr_srs_preserve_axis_order(osr.SpatialReference())
+    if isinstance(src_srs, str):
+        srs.ImportFromProj4(src_srs)
+    else:
+        srs.ImportFromEPSG(src_srs)
+
+    if srs_wgs84.IsSame(srs):
+        return None
+    return osr.CoordinateTransformation(srs, srs_wgs84)
+
+
+@functools.lru_cache(maxsize=None)
+def get_epsg_srs_list():
+    '''
+    Returns the (epsg, osr spatial reference) pairs of the epsgs list.  Each ImportFromEPSG is a PROJ database
+    lookup, so they are made once rather than on every get_epsg call.
+    '''
+
+    srs_list = []
+    for epsg in epsgs:
+        tgt_srs = utils.osr_srs_preserve_axis_order(osr.SpatialReference())
+        tgt_srs.ImportFromEPSG(epsg)
+        srs_list.append((epsg, tgt_srs))
+    return tuple(srs_list)
+
+
 def get_epsg(src_srs):
     '''
     Returns epsg code
@@ -2265,9 +2307,7 @@ def get_epsg(src_srs):
         raise RuntimeError("Input is not a osr.SpatialReference object or proj4 string")
 
     raster_epsg = None
-    for epsg in epsgs:
-        tgt_srs = utils.osr_srs_preserve_axis_order(osr.SpatialReference())
-        tgt_srs.ImportFromEPSG(epsg)
+    for epsg, tgt_srs in get_epsg_srs_list():
         if srs.IsSame(tgt_srs) == 1:
             raster_epsg = epsg
             break
@@ -4,7 +4,7 @@
 task handler classes and methods
 """
 
-import os, sys, string, shutil, signal, glob, re, logging, subprocess
+import os, sys, string, shutil, signal, glob, re, logging, subprocess, shlex
 import multiprocessing as mp
 
 #### Create Logger
@@ -14,13 +14,15 @@ logger.setLevel(logging.DEBUG)
 
 class Task(object):
 
-    def __init__(self, task_name, task_abrv, task_exe, task_cmd, task_method=None, task_method_arg_list=None):
+    def __init__(self, task_name, task_abrv, task_exe, task_cmd, task_method=None, task_method_arg_list=None,
+                 task_weight=0):
         self.name = task_name
         self.abrv = task_abrv
         self.exe = task_exe
         self.cmd = task_cmd
         self.method = task_method
         self.method_arg_list = task_method_arg_list
+        self.weight = task_weight  # relative cost (e.g. input size) for ordering tasks
 
 
 class PBSTaskHandler(object):
@@ -57,6 +59,24 @@ class PBSTaskHandler(object):
             else:
                 subprocess.call(cmd, shell=True)
 
+    def submit_array(self, manifest_path, num_tasks, job_name, max_concurrent=None, dryrun=False):
+        ## job arrays use Torque's qsub -t and PBS_ARRAYID; PBS Pro (qsub -J, PBS_ARRAY_INDEX) is not supported
+
+        array_range = '1-{}'.format(num_tasks)
+        if max_concurrent:
+            array_range += '%{}'.format(max_concurrent)
+
+        cmd = ['qsub'] + shlex.split(self.qsub_args) + [
+            '-N', job_name,
+            '-t', array_range,
+            '-v', 'manifest={}'.format(manifest_path),
+            self.qsubscript
+        ]
+        if dryrun:
+            print(shlex.join(cmd))
+        else:
+            subprocess.run(cmd, check=False)
+
 
 class PBSTaskGenerator(object):
 
@@ -121,6 +141,24 @@ class SLURMTaskHandler(object):
                 self.qsubscript
             )
             subprocess.call(cmd, shell=True)
+
+    def submit_array(self, manifest_path, num_tasks, job_name, max_concurrent=None, dryrun=False):
+
+        array_range = '1-{}'.format(num_tasks)
+        if max_concurrent:
+            array_range += '%{}'.format(max_concurrent)
+
+        cmd = [
+            'sbatch',
+            '-J', job_name,
+            '--array={}'.format(array_range),
+            '--export=manifest={}'.format(manifest_path),
+            self.qsubscript
+        ]
+        if dryrun:
+            print(shlex.join(cmd))
+        else:
+            subprocess.run(cmd, check=False)
             
 
 class ParallelTaskHandler(object):
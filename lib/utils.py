@@ -752,6 +752,42 @@ def shelve_item(raster, dst, args, tiles=None, shp_srs=None):
                         shutil.copy2(ifp, ofp)
 
 
+def split_ring_at_180(pts):
+    """
+    Split ring coordinates into the points west and east of 180 longitude, as arrays
+
+    Points on 0.0 go east.  Each segment whose x changes sign adds its intersection with 180 to
+    both parts (as -180 in the west part).
+
+    :param pts: <numpy.ndarray> (n, 2+) ring coordinates, first point repeated at the end
+    :return: <tuple> west and east <numpy.ndarray> (m, 2) points, not closed
+    """
+    xs = pts[:-1, 0]
+    ys = pts[:-1, 1]
+    crossing = np.flatnonzero(xs * pts[1:, 0] < 0)
+
+    # Find y where each crossing segment meets 180, adding 360 to negative x coordinates
+    x1 = xs[crossing]
+    x1 = np.where(x1 < 0.0, x1 + 360.0, x1)
+    x2 = pts[crossing + 1, 0]
+    x2 = np.where(x2 < 0.0, x2 + 360.0, x2)
+    run = x2 - x1
+    if np.any(run == 0):
+        raise RuntimeError("float division by zero")
+    y3 = ((180.0 - x1) * (pts[crossing + 1, 1] - ys[crossing])) / run + ys[crossing]
+
+    # Put each intersection after the first point of its segment (marked by a nan x), then bin the points
+    seq_x = np.insert(xs, crossing + 1, np.nan)
+    seq_y = np.insert(ys, crossing + 1, y3)
+    is_cross = np.isnan(seq_x)
+    west = is_cross | (seq_x < 0.0)
+    east = is_cross | (seq_x >= 0.0)
+    west_points = np.column_stack((np.where(is_cross, -180.0, seq_x)[west], seq_y[west]))
+    east_points = np.column_stack((np.where(is_cross, 180.0, seq_x)[east], seq_y[east]))
+
+    return west_points, east_points
+
+
 def getWrappedGeometry(src_geom):
     """
     Change a single-polygon extent to multipart if it crosses 180 latitude
@@ -761,54 +797,13 @@ def getWrappedGeometry(src_geom):
     :return: <osgeo.ogr.Geometry> type wkbMultiPolygon
     """
 
-    def calc_y_intersection_with_180(pt1, pt2):
-        """
-        Find y where x is 180 longitude
-
-        :param pt1: <list> coordinate pair, as int or float
-        :param pt2: <list> coordinate pair, int or float
-        :return: <float>
-        """
-        # Add 360 to negative x coordinates
-        pt1_x = pt1[0] + 360.0 if pt1[0] < 0.0 else pt1[0]
-        pt2_x = pt2[0] + 360.0 if pt2[0] < 0.0 else pt2[0]
-
-        rise = pt2[1] - pt1[1]      # Difference in y
-        run = pt2_x - pt1_x         # Difference in x
-        run_prime = 180.0 - pt1_x   # Difference in x to 180
-
-        try:
-            pt3_y = ((run_prime * rise) / run) + pt1[1]
-        except ZeroDivisionError as err:
-            raise RuntimeError(err)
-
-        return pt3_y
-
-    # Points lists for west and east components
-    west_points = []
-    east_points = []
-
-    # Assume a single polygon, deconstruct to points, skipping last one
+    # Assume a single polygon, split its points into west and east components
     ring_geom = src_geom.GetGeometryRef(0)
-    for i in range(0, ring_geom.GetPointCount() - 1):
-        pt1 = ring_geom.GetPoint(i)
-        pt2 = ring_geom.GetPoint(i + 1)
-
-        # Add point to appropriate bin (points on 0.0 go to east)
-        if pt1[0] < 0.0:
-            west_points.append(pt1)
-        else:
-            east_points.append(pt1)
-
-        # Test if segment to next point crosses 180 (x is opposite sign)
-        if (pt1[0] > 0) - (pt1[0] < 0) != (pt2[0] > 0) - (pt2[0] < 0):
-
-            # If segment crosses, calculate y for the intersection point
-            pt3_y = calc_y_intersection_with_180(pt1, pt2)
-
-            # Add the intersection point to both bins (change 180 to -180 for west)
-            west_points.append((-180.0, pt3_y))
-            east_points.append((180.0, pt3_y))
+    pts = np.asarray(ring_geom.GetPoints() or [], dtype=np.float64) # GetPoints() is None for an empty ring
+    if len(pts) > 0:
+        west_points, east_points = split_ring_at_180(pts)
+    else:
+        west_points, east_points = pts, pts
 
     # Build a multipart polygon from the new point sets (repeat first point to close polygon)
     mp_geometry = ogr.Geometry(ogr.wkbMultiPolygon)
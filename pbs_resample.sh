@@ -16,5 +16,11 @@ echo $a1
 source ~/.bashrc
 conda activate pgc
 
+# job array elements read their command from the matching line of the task manifest
+# (Torque job arrays only: PBS Pro sets PBS_ARRAY_INDEX instead of PBS_ARRAYID)
+if [ -n "$manifest" ] && [ -n "$PBS_ARRAYID" ]; then
+    p1=$(sed -n "${PBS_ARRAYID}p" "$manifest")
+fi
+
 echo $p1
 python $p1
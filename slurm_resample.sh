@@ -49,5 +49,10 @@ cd $SLURM_SUBMIT_DIR
 # init env
 source ~/.bashrc; conda activate pgc
 
+# job array elements read their command from the matching line of the task manifest
+if [ -n "$manifest" ] && [ -n "$SLURM_ARRAY_TASK_ID" ]; then
+    p1=$(sed -n "${SLURM_ARRAY_TASK_ID}p" "$manifest")
+fi
+
 echo $p1
 python $p1
@@ -0,0 +1,89 @@
+import argparse
+import logging
+import os
+import sys
+import unittest
+
+from osgeo import ogr
+
+script_dir = os.path.dirname(os.path.abspath(sys.argv[0]))
+root_dir = os.path.dirname(script_dir)
+sys.path.append(root_dir)
+
+import build_stac_items
+
+logger = logging.getLogger("logger")
+# lso = logging.StreamHandler()
+# lso.setLevel(logging.ERROR)
+# formatter = logging.Formatter('%(asctime)s %(levelname)s- %(message)s','%m-%d-%Y %H:%M:%S')
+# lso.setFormatter(formatter)
+# logger.addHandler(lso)
+
+
+def make_polygon(points):
+    ring = ogr.Geometry(ogr.wkbLinearRing)
+    for x, y in points:
+        ring.AddPoint_2D(x, y)
+    poly = ogr.Geometry(ogr.wkbPolygon)
+    poly.AddGeometry(ring)
+    return poly
+
+
+class TestGeojsonFootprint(unittest.TestCase):
+
+    def test_narrow_footprint(self):
+        points = [(10, 10), (20, 10), (20, 20), (10, 20), (10, 10)]
+        bbox, geometry = build_stac_items.get_geojson_footprint(make_polygon(points))
+        self.assertEqual(bbox, [10, 10, 20, 20])
+        self.assertEqual(geometry, {
+            "type": "MultiPolygon",
+            "coordinates": [[[list(pt) for pt in points]]]
+        })
+
+    def test_wide_crossing_footprint(self):
+        points = [(170, 10), (-170, 10), (-170, 20), (170, 20), (170, 10)]
+        bbox, geometry = build_stac_items.get_geojson_footprint(make_polygon(points))
+        self.assertEqual(bbox, [170, 10, -170, 20])
+        self.assertEqual(geometry, {
+            "type": "MultiPolygon",
+            "coordinates": [
+                [[[-180, 10], [-170, 10], [-170, 20], [-180, 20], [-180, 10]]],
+                [[[170, 10], [180, 10], [180, 20], [170, 20], [170, 10]]],
+            ]
+        })
+
+    def test_wide_non_crossing_footprint(self):
+        # more than 180 degrees wide, but x only touches 0 and never changes sign between consecutive points
+        points = [(-90, 10), (0, 10), (100, 10), (100, 20), (0, 20), (-90, 20), (-90, 10)]
+        bbox, geometry = build_stac_items.get_geojson_footprint(make_polygon(points))
+        self.assertEqual(bbox, [-90, 10, 100, 20])
+        self.assertEqual(geometry, {
+            "type": "MultiPolygon",
+            "coordinates": [
+                [[[-90, 10], [-90, 20], [-90, 10]]],
+                [[[0, 10], [100, 10], [100, 20], [0, 20], [0, 10]]],
+            ]
+        })
+
+
+if __name__ == '__main__':
+
+    #### Set Up Arguments
+    parser = argparse.ArgumentParser(
+        description="Test build_stac_items"
+        )
+
+    #### Parse Arguments
+    args = parser.parse_args()
+
+    test_cases = [
+        TestGeojsonFootprint,
+    ]
+
+    suites = []
+    for test_case in test_cases:
+        suite = unittest.TestLoader().loadTestsFromTestCase(test_case)
+        suites.append(suite)
+
+    alltests = unittest.TestSuite(suites)
+    unittest.TextTestRunner(verbosity=2).run(alltests)
@@ -4,6 +4,9 @@ import os
 import sys
 import unittest
 
+import numpy as np
+from osgeo import ogr
+
 script_dir = os.path.dirname(os.path.abspath(sys.argv[0]))
 root_dir = os.path.dirname(script_dir)
 sys.path.append(root_dir)
@@ -373,6 +376,28 @@ class TestCopyDems(unittest.TestCase):
             else:
                 self.assertFalse(move_file)
 
+
+class TestSplitRingAt180(unittest.TestCase):
+
+    def test_crossing_ring(self):
+        pts = np.array([(170, 10), (-170, 10), (-170, 20), (170, 20), (170, 10)], dtype=np.float64)
+        west, east = utils.split_ring_at_180(pts)
+        self.assertEqual(west.tolist(), [[-180, 10], [-170, 10], [-170, 20], [-180, 20]])
+        self.assertEqual(east.tolist(), [[170, 10], [180, 10], [180, 20], [170, 20]])
+
+    def test_non_crossing_ring(self):
+        pts = np.array([(10, 10), (20, 10), (20, 20), (10, 10)], dtype=np.float64)
+        west, east = utils.split_ring_at_180(pts)
+        self.assertEqual(len(west), 0)
+        self.assertEqual(east.tolist(), [[10, 10], [20, 10], [20, 20]])
+
+    def test_empty_ring(self):
+        poly = ogr.Geometry(ogr.wkbPolygon)
+        poly.AddGeometry(ogr.Geometry(ogr.wkbLinearRing))
+        wrapped = utils.getWrappedGeometry(poly)
+        self.assertEqual(wrapped.GetGeometryName(), 'MULTIPOLYGON')
+        self.assertEqual(wrapped.GetGeometryCount(), 0)
+
     
 class DemArgs(object):
     def __init__(self):
@@ -398,6 +423,7 @@ if __name__ == '__main__':
         
     test_cases = [
         TestCopyDems,
+        TestSplitRingAt180,
     ]
     
     suites = []